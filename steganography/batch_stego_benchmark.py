@@ -1,75 +1,173 @@
 # batch_stego_benchmark.py - FULL VERSION WITH SAMPLE OPTIONS
 import os
+import csv
 import time
-import glob
 import argparse
+import atexit
+import itertools
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
+import torch
 from pathlib import Path
 from PIL import Image
 import pandas as pd
 
 from utils.image_io import pil_to_numpy, numpy_to_pil
-from utils.metrics import compute_psnr, compute_ssim
+from utils.metrics import compute_psnr, compute_ssim, compute_psnr_torch, compute_ssim_torch
 from lsb.lsb_stego import lsb_hide, lsb_reveal
-from stegformer_infer import StegFormerInfer
+from stegformer_infer import get_stegformer
 
 STEGO_SIZE = (256, 256)
+ALGOS = ('LSB', 'StegFormer')
+METRIC_KEYS = ('cov_psnr', 'cov_ssim', 'sec_psnr', 'sec_ssim', 'inference_time')
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg'}
+CSV_FIELDS = ('algo', 'filename', 'pair_id') + METRIC_KEYS
+FLUSH_EVERY = 100  # pairs
 
 def load_stegformer(weights_path: str):
-    return StegFormerInfer(weights_path)
+    # Every StegFormer call stays on the main thread, so CUDA graphs pay off
+    return get_stegformer(weights_path, cuda_graphs=True)
+
+def list_images(folder):
+    """Sorted image paths in folder, from a single directory read"""
+    return sorted(
+        e.path for e in os.scandir(folder)
+        if e.is_file() and os.path.splitext(e.name)[1].lower() in IMAGE_EXTS
+    )
 
 def resize_256(img: Image.Image) -> Image.Image:
     return img.resize(STEGO_SIZE, Image.BICUBIC)
 
-def process_single_pair(cover_path, secret_path, stegformer):
-    """Process one cover-secret pair"""
+@torch.inference_mode()
+def batch_metrics_torch(covers, stegos, secrets, recs):
+    """PSNR/SSIM for a whole batch of NCHW device tensors.
+
+    Only the (4, N) table of scalars is copied back to the host.
+    """
+    table = torch.stack([
+        compute_psnr_torch(covers, stegos),
+        compute_ssim_torch(covers, stegos),
+        compute_psnr_torch(secrets, recs),
+        compute_ssim_torch(secrets, recs),
+    ]).cpu().numpy()
+    return dict(zip(('cov_psnr', 'cov_ssim', 'sec_psnr', 'sec_ssim'), table))
+
+def _decode_256(path) -> np.ndarray:
+    img = Image.open(path)
+    # JPEG only (no-op otherwise): let libjpeg decode at 1/2, 1/4, ... scale
+    # while staying >= 2x the target, so bicubic still has detail to work with
+    img.draft("RGB", (2 * STEGO_SIZE[0], 2 * STEGO_SIZE[1]))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return pil_to_numpy(resize_256(img))
+
+def build_cache(paths, cache_path):
+    """Decode + resize every image once into an (N,256,256,3) uint8 memmap.
+
+    Returns (cache, ok) where ok[i] is False for files that failed to load.
+    This is the only place bad inputs are caught; everything downstream
+    works on the validated rows.
+    """
+    cache = np.lib.format.open_memmap(
+        cache_path, mode="w+", dtype=np.uint8,
+        shape=(len(paths), STEGO_SIZE[1], STEGO_SIZE[0], 3),
+    )
+    ok = np.zeros(len(paths), dtype=bool)
+
+    def fill(i):
+        try:
+            cache[i] = _decode_256(paths[i])
+            ok[i] = True
+        except Exception as e:
+            print(f"Error processing {paths[i]}: {e}")
+
+    # PIL releases the GIL while decoding/resizing
+    with ThreadPoolExecutor() as pool:
+        list(pool.map(fill, range(len(paths))))
+    cache.flush()
+    return cache, ok
+
+# Per-worker read-only views of the decode caches (see _init_worker)
+_covers = None
+_secrets = None
+
+def _init_worker(covers_path, secrets_path):
+    global _covers, _secrets
+    _covers = np.load(covers_path, mmap_mode="r")
+    _secrets = np.load(secrets_path, mmap_mode="r")
+
+def _lsb_and_metrics(i):
+    """Run LSB and its metrics on cached pair i (CPU only, runs in a worker).
+
+    Pairs are validated when the cache is built, so there is no error path here.
+    """
+    cover_np = np.asarray(_covers[i])
+    secret_np = np.asarray(_secrets[i])
+
+    start_time = time.time()
+    stego_lsb = lsb_hide(cover_np, secret_np)
+    rec_lsb = lsb_reveal(stego_lsb)
+    lsb_time = (time.time() - start_time) * 1000
+
+    # Scored per pair on purpose: the uint8 Numba kernels behind
+    # compute_psnr / compute_ssim (~2 ms a pair) beat stacking the batch
+    # through the NumPy or CPU torch filters by over an order of magnitude.
+    return {
+        'cov_psnr': compute_psnr(cover_np, stego_lsb),
+        'cov_ssim': compute_ssim(cover_np, stego_lsb),
+        'sec_psnr': compute_psnr(secret_np, rec_lsb),
+        'sec_ssim': compute_ssim(secret_np, rec_lsb),
+        'inference_time': lsb_time
+    }
+
+def process_stegformer_batch(idx, lsb_metrics, covers, secrets, names, stegformer):
+    """Run StegFormer on cached pairs idx (already through LSB).
+
+    Returns one [LSB, StegFormer] result list per successful pair.
+    """
+    if len(idx) == 0:
+        return []
+
+    cov = covers[idx]
+    sec = secrets[idx]
+
+    # One forward pass per mini-batch; outputs stay on the device
     try:
-        cover_pil = resize_256(Image.open(cover_path).convert("RGB"))
-        secret_pil = resize_256(Image.open(secret_path).convert("RGB"))
-        cover_np = pil_to_numpy(cover_pil)
-        secret_np = pil_to_numpy(secret_pil)
-        
-        results = []
-        
-        # LSB
         start_time = time.time()
-        stego_lsb = lsb_hide(cover_np, secret_np)
-        rec_lsb = lsb_reveal(stego_lsb)
-        lsb_time = (time.time() - start_time) * 1000
-        
-        results.append({
-            'algo': 'LSB',
-            'filename': Path(cover_path).stem,
-            'pair_id': len(results),
-            'cov_psnr': compute_psnr(cover_np, stego_lsb),
-            'cov_ssim': compute_ssim(cover_np, stego_lsb),
-            'sec_psnr': compute_psnr(secret_np, rec_lsb),
-            'sec_ssim': compute_ssim(secret_np, rec_lsb),
-            'inference_time': lsb_time
-        })
-        
-        # StegFormer
-        start_time = time.time()
-        stego_sf = stegformer.hide(cover_np, secret_np)
-        rec_sf = stegformer.reveal(stego_sf)
-        sf_time = (time.time() - start_time) * 1000
-        
-        results.append({
-            'algo': 'StegFormer',
-            'filename': Path(cover_path).stem,
-            'pair_id': len(results),
-            'cov_psnr': compute_psnr(cover_np, stego_sf),
-            'cov_ssim': compute_ssim(cover_np, stego_sf),
-            'sec_psnr': compute_psnr(secret_np, rec_sf),
-            'sec_ssim': compute_ssim(secret_np, rec_sf),
-            'inference_time': sf_time
-        })
-        
-        return results
-        
+        cov_t = stegformer.upload(cov, 0)
+        sec_t = stegformer.upload(sec, 1)
+        stegos_sf = stegformer.hide_tensor(cov_t, sec_t)
+        recs_sf = stegformer.reveal_tensor(stegos_sf)
+        stegformer.synchronize()
+        sf_time = (time.time() - start_time) * 1000 / len(idx)
     except Exception as e:
-        print(f"Error processing {cover_path}: {e}")
-        return None
+        print(f"Error processing batch starting at {names[idx[0]]}: {e}")
+        return []
+
+    sf_m = batch_metrics_torch(cov_t, stegos_sf, sec_t, recs_sf)
+
+    results = []
+    for k, (i, lsb_m) in enumerate(zip(idx, lsb_metrics)):
+        results.append([
+            {
+                'algo': 'LSB',
+                'filename': names[i],
+                'pair_id': 0,
+                **lsb_m
+            },
+            {
+                'algo': 'StegFormer',
+                'filename': names[i],
+                'pair_id': 1,
+                **{key: float(v[k]) for key, v in sf_m.items()},
+                'inference_time': sf_time
+            },
+        ])
+
+    return results
 
 def main():
     parser = argparse.ArgumentParser(description="Batch steganography benchmark")
@@ -78,6 +176,11 @@ def main():
     parser.add_argument('--weights', default="weights/StegFormer-S_baseline.pt", help="StegFormer weights")
     parser.add_argument('--sample', type=int, help="Process only first N pairs (e.g. --sample 50)")
     parser.add_argument('--output', default="batch_results.csv", help="Output CSV name")
+    parser.add_argument('--batch', type=int, default=16, help="StegFormer mini-batch size")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes for LSB + metrics")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Where to write the decoded covers.npy / secrets.npy "
+                             "(default: a temporary directory, removed on exit)")
     
     args = parser.parse_args()
     
@@ -95,12 +198,8 @@ def main():
     print("✅ StegFormer loaded")
     
     # Get image files
-    cover_files = sorted(glob.glob(os.path.join(args.covers, "*.png")) + 
-                        glob.glob(os.path.join(args.covers, "*.jpg")) +
-                        glob.glob(os.path.join(args.covers, "*.jpeg")))
-    secret_files = sorted(glob.glob(os.path.join(args.secrets, "*.png")) + 
-                         glob.glob(os.path.join(args.secrets, "*.jpg")) +
-                         glob.glob(os.path.join(args.secrets, "*.jpeg")))
+    cover_files = list_images(args.covers)
+    secret_files = list_images(args.secrets)
     
     print(f"Found {len(cover_files)} cover images")
     print(f"Found {len(secret_files)} secret images")
@@ -112,27 +211,66 @@ def main():
     
     print(f"Processing {min_pairs} image pairs...")
     
+    # Decode + resize every image exactly once
+    print("Decoding images...")
+    if args.cache_dir is None:
+        # ~200 KB per image per cache: don't leave them behind by default
+        cache_dir = tempfile.mkdtemp(prefix="stego_cache_")
+        atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    else:
+        cache_dir = args.cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+    covers_path = os.path.join(cache_dir, "covers.npy")
+    secrets_path = os.path.join(cache_dir, "secrets.npy")
+    covers, cover_ok = build_cache(cover_files[:min_pairs], covers_path)
+    secrets, secret_ok = build_cache(secret_files[:min_pairs], secrets_path)
+    valid = np.flatnonzero(cover_ok & secret_ok)
+    names = [Path(p).stem for p in cover_files[:min_pairs]]
+    
+    # Compile / capture every batch shape the timed loop will see, including
+    # a smaller last batch, so none of it lands inside the timings
+    print("Warming up StegFormer...")
+    warm_sizes = {min(args.batch, len(valid)), len(valid) % args.batch} - {0}
+    stegformer.warmup(batch_sizes=sorted(warm_sizes), size=STEGO_SIZE)
+    
     # Process
-    all_results = []
     successful_pairs = 0
+    # (N, len(METRIC_KEYS)) per algo, filled row by row for the summary
+    metrics = {algo: np.empty((len(valid), len(METRIC_KEYS))) for algo in ALGOS}
     
-    for i in range(min_pairs):
-        cover_path = cover_files[i]
-        secret_path = secret_files[i]
-        
-        if i % 50 == 0 or i < 5:
-            print(f"Progress: {i+1}/{min_pairs} ({100*(i+1)/min_pairs:.1f}%)")
+    # Detailed rows are streamed to the CSV as pairs complete, so a crash
+    # keeps everything up to the last flush.
+    # LSB + metrics fan out over worker processes; StegFormer stays on the
+    # main process and consumes the (ordered) results in mini-batches.
+    # Spawned, not forked: CUDA is already initialised in this process.
+    with open(args.output, "w", newline="") as out_f, ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(covers_path, secrets_path),
+    ) as pool:
+        writer = csv.DictWriter(out_f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        lsb_iter = pool.map(_lsb_and_metrics, valid, chunksize=8)
         
-        metrics_pair = process_single_pair(cover_path, secret_path, stegformer)
-        if metrics_pair:
-            all_results.extend(metrics_pair)
-            successful_pairs += 1
+        for start in range(0, len(valid), args.batch):
+            idx = valid[start:start + args.batch]
+            lsb_chunk = list(itertools.islice(lsb_iter, len(idx)))
+            done = start + len(idx)
+            
+            print(f"Progress: {done}/{len(valid)} ({100*done/len(valid):.1f}%)")
+            
+            for metrics_pair in process_stegformer_batch(
+                idx, lsb_chunk, covers, secrets, names, stegformer
+            ):
+                writer.writerows(metrics_pair)
+                for row in metrics_pair:
+                    metrics[row['algo']][successful_pairs] = [row[k] for k in METRIC_KEYS]
+                successful_pairs += 1
+                if successful_pairs % FLUSH_EVERY == 0:
+                    out_f.flush()
     
     print(f"\n✅ Completed {successful_pairs}/{min_pairs} pairs successfully")
-    
-    # Save detailed results
-    df_detailed = pd.DataFrame(all_results)
-    df_detailed.to_csv(args.output, index=False)
     print(f"Detailed results saved: {args.output}")
     
     # Summary
@@ -141,25 +279,21 @@ def main():
     print("="*70)
     
     summary = {}
-    for algo in ['LSB', 'StegFormer']:
-        algo_data = df_detailed[df_detailed['algo'] == algo]
+    for algo in ALGOS:
+        algo_data = metrics[algo][:successful_pairs]
         
         if len(algo_data) == 0:
             continue
-            
-        avg_metrics = {
-            'cov_psnr': algo_data['cov_psnr'].mean(),
-            'cov_psnr_std': algo_data['cov_psnr'].std(),
-            'cov_ssim': algo_data['cov_ssim'].mean(),
-            'cov_ssim_std': algo_data['cov_ssim'].std(),
-            'sec_psnr': algo_data['sec_psnr'].mean(),
-            'sec_psnr_std': algo_data['sec_psnr'].std(),
-            'sec_ssim': algo_data['sec_ssim'].mean(),
-            'sec_ssim_std': algo_data['sec_ssim'].std(),
-            'inference_time': algo_data['inference_time'].mean(),
-            'inference_time_std': algo_data['inference_time'].std(),
-            'n_samples': len(algo_data)
-        }
+        
+        # Two reductions for every column (ddof=1 matches the pandas .std())
+        means = algo_data.mean(axis=0)
+        stds = algo_data.std(axis=0, ddof=1)
+        
+        avg_metrics = {}
+        for key, mean, std in zip(METRIC_KEYS, means, stds):
+            avg_metrics[key] = mean
+            avg_metrics[f'{key}_std'] = std
+        avg_metrics['n_samples'] = len(algo_data)
         summary[algo] = avg_metrics
         
         print(f"\n{algo}:")
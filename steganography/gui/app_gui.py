@@ -2,6 +2,7 @@
 import os
 import csv
 import datetime
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
@@ -10,7 +11,7 @@ import numpy as np
 from utils.image_io import load_image, pil_to_numpy, numpy_to_pil
 from utils.metrics import compute_psnr, compute_ssim
 from lsb.lsb_stego import lsb_hide, lsb_reveal
-from stegformer_infer import StegFormerInfer
+from stegformer_infer import get_stegformer
 
 STEGO_SIZE = (256, 256)    # StegFormer input
 DISPLAY_SIZE = (256, 256)  # GUI thumbnails
@@ -63,7 +64,7 @@ class StegoApp(tk.Tk):
         style.map("Secondary.TButton", background=[("active", "#059669")])
 
         # ---------- models ----------
-        self.stegformer = StegFormerInfer(weights_path)
+        self.stegformer = get_stegformer(weights_path)
 
         # ---------- data ----------
         self.cover_np = None   # 256×256×3
@@ -74,7 +75,13 @@ class StegoApp(tk.Tk):
         self.stego_steg = None
         self.rec_steg = None
 
-        self._tk_images = {}
+        # fixed pool of Tk images, refreshed in place with .paste()
+        self._tk_images = {
+            k: ImageTk.PhotoImage(Image.new("RGB", DISPLAY_SIZE))
+            for k in ["cover", "secret", "lsb_stego", "lsb_rec", "steg_stego", "steg_rec"]
+        }
+        self._steg_inputs = {}  # role -> (source array, resized array)
+        self._running = set()   # algorithms with a worker thread in flight
 
         self.metrics = {
             "LSB": {"cov_psnr": None, "cov_ssim": None,
@@ -91,17 +98,6 @@ class StegoApp(tk.Tk):
         )
         self.status_var = tk.StringVar(value="Ready")
 
-        # detailed metrics vars
-        self.lsb_cov_psnr_var = tk.StringVar(value="-")
-        self.lsb_cov_ssim_var = tk.StringVar(value="-")
-        self.lsb_sec_psnr_var = tk.StringVar(value="-")
-        self.lsb_sec_ssim_var = tk.StringVar(value="-")
-
-        self.steg_cov_psnr_var = tk.StringVar(value="-")
-        self.steg_cov_ssim_var = tk.StringVar(value="-")
-        self.steg_sec_psnr_var = tk.StringVar(value="-")
-        self.steg_sec_ssim_var = tk.StringVar(value="-")
-
         # ---------- layout ----------
         self._build_layout()
 
@@ -277,59 +273,58 @@ class StegoApp(tk.Tk):
         table_frame = ttk.LabelFrame(parent, text="Metrics Comparison", padding=5)
         table_frame.pack(fill=tk.X, pady=10)
 
-        headers = [
+        # one widget for the whole table; a run updates its row in one call
+        columns = ("algo", "cov_psnr", "cov_ssim", "sec_psnr", "sec_ssim")
+        headers = (
             "Algorithm",
             "Cover PSNR",
             "Cover SSIM",
             "Secret PSNR",
             "Secret SSIM",
-        ]
-        for c, h in enumerate(headers):
-            ttk.Label(
-                table_frame,
-                text=h,
-                style="App.TLabel",
-                font=("Segoe UI", 9, "bold"),
-            ).grid(row=0, column=c, padx=4, pady=2, sticky="w")
-
-        # LSB row
-        ttk.Label(table_frame, text="LSB", style="App.TLabel").grid(
-            row=1, column=0, padx=4, pady=2, sticky="w"
         )
-        ttk.Label(table_frame, textvariable=self.lsb_cov_psnr_var,
-                  style="App.TLabel").grid(row=1, column=1, padx=4, pady=2)
-        ttk.Label(table_frame, textvariable=self.lsb_cov_ssim_var,
-                  style="App.TLabel").grid(row=1, column=2, padx=4, pady=2)
-        ttk.Label(table_frame, textvariable=self.lsb_sec_psnr_var,
-                  style="App.TLabel").grid(row=1, column=3, padx=4, pady=2)
-        ttk.Label(table_frame, textvariable=self.lsb_sec_ssim_var,
-                  style="App.TLabel").grid(row=1, column=4, padx=4, pady=2)
-
-        # StegFormer row
-        ttk.Label(table_frame, text="StegFormer", style="App.TLabel").grid(
-            row=2, column=0, padx=4, pady=2, sticky="w"
+        self.metrics_tree = ttk.Treeview(
+            table_frame, columns=columns, show="headings", height=2,
+            selectmode="none",
         )
-        ttk.Label(table_frame, textvariable=self.steg_cov_psnr_var,
-                  style="App.TLabel").grid(row=2, column=1, padx=4, pady=2)
-        ttk.Label(table_frame, textvariable=self.steg_cov_ssim_var,
-                  style="App.TLabel").grid(row=2, column=2, padx=4, pady=2)
-        ttk.Label(table_frame, textvariable=self.steg_sec_psnr_var,
-                  style="App.TLabel").grid(row=2, column=3, padx=4, pady=2)
-        ttk.Label(table_frame, textvariable=self.steg_sec_ssim_var,
-                  style="App.TLabel").grid(row=2, column=4, padx=4, pady=2)
+        for col, h in zip(columns, headers):
+            self.metrics_tree.heading(col, text=h, anchor=tk.W)
+            self.metrics_tree.column(col, width=110, anchor=tk.W, stretch=False)
+        for algo in ("LSB", "StegFormer"):
+            self.metrics_tree.insert("", "end", iid=algo,
+                                     values=(algo, "-", "-", "-", "-"))
+        self.metrics_tree.pack(anchor=tk.W)
+
+    def _set_table_row(self, algo, metrics=None):
+        if metrics is None:
+            values = (algo, "-", "-", "-", "-")
+        else:
+            values = (
+                algo,
+                f"{metrics['cov_psnr']:.2f}",
+                f"{metrics['cov_ssim']:.3f}",
+                f"{metrics['sec_psnr']:.2f}",
+                f"{metrics['sec_ssim']:.3f}",
+            )
+        self.metrics_tree.item(algo, values=values)
 
     # ======================================================================
     # Image helpers
     # ======================================================================
 
     def _pil_fixed(self, pil_img: Image.Image) -> Image.Image:
-        return pil_img.resize(DISPLAY_SIZE, Image.BICUBIC)
+        # display tile only; bilinear is plenty for a 256×256 preview
+        return pil_img.resize(DISPLAY_SIZE, Image.BILINEAR)
+
+    def _pil_stego(self, pil_img: Image.Image) -> Image.Image:
+        # algorithm input; StegFormer was trained on bicubic resizes
+        return pil_img.resize(STEGO_SIZE, Image.BICUBIC)
 
     def _set_label_image(self, label: ttk.Label, pil_img: Image.Image, key: str):
-        fixed = self._pil_fixed(pil_img)
-        tk_img = ImageTk.PhotoImage(fixed)
-        self._tk_images[key] = tk_img
-        label.configure(image=tk_img)
+        tk_img = self._tk_images[key]
+        tk_img.paste(self._pil_fixed(pil_img))
+        # bind once (and again after clear_results unbinds it)
+        if str(label.cget("image")) != str(tk_img):
+            label.configure(image=tk_img)
 
     # ======================================================================
     # Input loading
@@ -343,9 +338,9 @@ class StegoApp(tk.Tk):
         if not path:
             return
         pil_img = load_image(path)
-        pil_fixed = self._pil_fixed(pil_img)
-        self.cover_np = pil_to_numpy(pil_fixed)
-        self._set_label_image(self.lbl_cover, pil_fixed, "cover")
+        pil_stego = self._pil_stego(pil_img)
+        self.cover_np = pil_to_numpy(pil_stego)
+        self._set_label_image(self.lbl_cover, pil_stego, "cover")
         # keep overlay so user can click again; no place_forget
         self.status_var.set(f"Loaded cover image: {os.path.basename(path)}")
 
@@ -357,9 +352,9 @@ class StegoApp(tk.Tk):
         if not path:
             return
         pil_img = load_image(path)
-        pil_fixed = self._pil_fixed(pil_img)
-        self.secret_np = pil_to_numpy(pil_fixed)
-        self._set_label_image(self.lbl_secret, pil_fixed, "secret")
+        pil_stego = self._pil_stego(pil_img)
+        self.secret_np = pil_to_numpy(pil_stego)
+        self._set_label_image(self.lbl_secret, pil_stego, "secret")
         self.status_var.set(f"Loaded secret image: {os.path.basename(path)}")
 
     # ======================================================================
@@ -380,10 +375,16 @@ class StegoApp(tk.Tk):
             return False
         return True
 
-    def _resize_for_steg(self, img_np: np.ndarray) -> np.ndarray:
+    def _resize_for_steg(self, img_np: np.ndarray, role: str) -> np.ndarray:
+        # cached until a new cover/secret array is loaded
+        cached = self._steg_inputs.get(role)
+        if cached is not None and cached[0] is img_np:
+            return cached[1]
         pil_img = numpy_to_pil(img_np)
         pil_resized = pil_img.resize(STEGO_SIZE, Image.BICUBIC)
-        return pil_to_numpy(pil_resized)
+        resized = pil_to_numpy(pil_resized)
+        self._steg_inputs[role] = (img_np, resized)
+        return resized
 
     # ======================================================================
     # Clear / export
@@ -395,16 +396,15 @@ class StegoApp(tk.Tk):
         self.stego_steg = None
         self.rec_steg = None
 
-        for key, lbl_name in [
-            ("lsb_stego", "lbl_lsb_stego"),
-            ("lsb_rec", "lbl_lsb_rec"),
-            ("steg_stego", "lbl_steg_stego"),
-            ("steg_rec", "lbl_steg_rec"),
+        for lbl_name in [
+            "lbl_lsb_stego",
+            "lbl_lsb_rec",
+            "lbl_steg_stego",
+            "lbl_steg_rec",
         ]:
             lbl = getattr(self, lbl_name, None)
             if lbl is not None:
                 lbl.configure(image="")
-            self._tk_images.pop(key, None)
 
         self.metrics = {
             "LSB": {"cov_psnr": None, "cov_ssim": None,
@@ -416,17 +416,8 @@ class StegoApp(tk.Tk):
         self.metrics_lsb_var.set("LSB: PSNR/SSIM – not computed")
         self.metrics_steg_var.set("StegFormer: PSNR/SSIM – not computed")
 
-        for v in [
-            self.lsb_cov_psnr_var,
-            self.lsb_cov_ssim_var,
-            self.lsb_sec_psnr_var,
-            self.lsb_sec_ssim_var,
-            self.steg_cov_psnr_var,
-            self.steg_cov_ssim_var,
-            self.steg_sec_psnr_var,
-            self.steg_sec_ssim_var,
-        ]:
-            v.set("-")
+        for algo in self.metrics:
+            self._set_table_row(algo)
 
         self.status_var.set("Results cleared")
 
@@ -486,93 +477,115 @@ class StegoApp(tk.Tk):
     # ======================================================================
 
     def run_lsb(self):
-        if not self._check_inputs():
+        if not self._check_inputs() or "LSB" in self._running:
             return
 
+        self._running.add("LSB")
         self.status_var.set("Running LSB...")
-        self.update_idletasks()
-
-        stego = lsb_hide(self.cover_np, self.secret_np)
-        rec = lsb_reveal(stego)
+        threading.Thread(
+            target=self._lsb_worker,
+            args=(self.cover_np, self.secret_np),
+            daemon=True,
+        ).start()
+
+    def _lsb_worker(self, cover_np, secret_np):
+        # background thread: no Tk calls except self.after
+        try:
+            stego = lsb_hide(cover_np, secret_np)
+            rec = lsb_reveal(stego)
+            metrics = {
+                "cov_psnr": compute_psnr(cover_np, stego),
+                "cov_ssim": compute_ssim(cover_np, stego),
+                "sec_psnr": compute_psnr(secret_np, rec),
+                "sec_ssim": compute_ssim(secret_np, rec),
+            }
+        except Exception as e:
+            self.after(0, self._fail_run, "LSB", e)
+            return
+        self.after(0, self._finish_lsb, stego, rec, metrics)
 
+    def _finish_lsb(self, stego, rec, metrics):
+        self._running.discard("LSB")
         self.stego_lsb = stego
         self.rec_lsb = rec
 
         self._set_label_image(self.lbl_lsb_stego, numpy_to_pil(stego), "lsb_stego")
         self._set_label_image(self.lbl_lsb_rec, numpy_to_pil(rec), "lsb_rec")
 
-        cov_psnr = compute_psnr(self.cover_np, stego)
-        cov_ssim = compute_ssim(self.cover_np, stego)
-        sec_psnr = compute_psnr(self.secret_np, rec)
-        sec_ssim = compute_ssim(self.secret_np, rec)
-
-        self.metrics["LSB"] = {
-            "cov_psnr": cov_psnr,
-            "cov_ssim": cov_ssim,
-            "sec_psnr": sec_psnr,
-            "sec_ssim": sec_ssim,
-        }
+        self.metrics["LSB"] = metrics
+        cov_psnr = metrics["cov_psnr"]
+        cov_ssim = metrics["cov_ssim"]
+        sec_psnr = metrics["sec_psnr"]
+        sec_ssim = metrics["sec_ssim"]
 
         self.metrics_lsb_var.set(
             f"LSB: Cover/Stego PSNR={cov_psnr:.2f}, SSIM={cov_ssim:.3f} | "
             f"Secret/Rec PSNR={sec_psnr:.2f}, SSIM={sec_ssim:.3f}"
         )
 
-        self.lsb_cov_psnr_var.set(f"{cov_psnr:.2f}")
-        self.lsb_cov_ssim_var.set(f"{cov_ssim:.3f}")
-        self.lsb_sec_psnr_var.set(f"{sec_psnr:.2f}")
-        self.lsb_sec_ssim_var.set(f"{sec_ssim:.3f}")
+        self._set_table_row("LSB", metrics)
 
         self.status_var.set("LSB run completed")
 
+    def _fail_run(self, name, error):
+        self._running.discard(name)
+        messagebox.showerror(f"{name} error", str(error))
+        self.status_var.set(f"{name} failed")
+
     # ======================================================================
     # StegFormer
     # ======================================================================
 
     def run_stegformer(self):
-        if not self._check_inputs():
+        if not self._check_inputs() or "StegFormer" in self._running:
             return
 
+        self._running.add("StegFormer")
         self.status_var.set("Running StegFormer...")
-        self.update_idletasks()
-
+        threading.Thread(
+            target=self._stegformer_worker,
+            args=(self.cover_np, self.secret_np),
+            daemon=True,
+        ).start()
+
+    def _stegformer_worker(self, cover_np, secret_np):
+        # background thread: PyTorch releases the GIL, Tk stays responsive
         try:
-            cov = self._resize_for_steg(self.cover_np)
-            sec = self._resize_for_steg(self.secret_np)
+            cov = self._resize_for_steg(cover_np, "cover")
+            sec = self._resize_for_steg(secret_np, "secret")
 
             stego = self.stegformer.hide(cov, sec)
             rec = self.stegformer.reveal(stego)
+            metrics = {
+                "cov_psnr": compute_psnr(cov, stego),
+                "cov_ssim": compute_ssim(cov, stego),
+                "sec_psnr": compute_psnr(sec, rec),
+                "sec_ssim": compute_ssim(sec, rec),
+            }
         except Exception as e:
-            messagebox.showerror("StegFormer error", str(e))
-            self.status_var.set("StegFormer failed")
+            self.after(0, self._fail_run, "StegFormer", e)
             return
+        self.after(0, self._finish_stegformer, stego, rec, metrics)
 
+    def _finish_stegformer(self, stego, rec, metrics):
+        self._running.discard("StegFormer")
         self.stego_steg = stego
         self.rec_steg = rec
 
         self._set_label_image(self.lbl_steg_stego, numpy_to_pil(stego), "steg_stego")
         self._set_label_image(self.lbl_steg_rec, numpy_to_pil(rec), "steg_rec")
 
-        cov_psnr = compute_psnr(cov, stego)
-        cov_ssim = compute_ssim(cov, stego)
-        sec_psnr = compute_psnr(sec, rec)
-        sec_ssim = compute_ssim(sec, rec)
-
-        self.metrics["StegFormer"] = {
-            "cov_psnr": cov_psnr,
-            "cov_ssim": cov_ssim,
-            "sec_psnr": sec_psnr,
-            "sec_ssim": sec_ssim,
-        }
+        self.metrics["StegFormer"] = metrics
+        cov_psnr = metrics["cov_psnr"]
+        cov_ssim = metrics["cov_ssim"]
+        sec_psnr = metrics["sec_psnr"]
+        sec_ssim = metrics["sec_ssim"]
 
         self.metrics_steg_var.set(
             f"StegFormer: Cover/Stego PSNR={cov_psnr:.2f}, SSIM={cov_ssim:.3f} | "
             f"Secret/Rec PSNR={sec_psnr:.2f}, SSIM={sec_ssim:.3f}"
         )
 
-        self.steg_cov_psnr_var.set(f"{cov_psnr:.2f}")
-        self.steg_cov_ssim_var.set(f"{cov_ssim:.3f}")
-        self.steg_sec_psnr_var.set(f"{sec_psnr:.2f}")
-        self.steg_sec_ssim_var.set(f"{sec_ssim:.3f}")
+        self._set_table_row("StegFormer", metrics)
 
         self.status_var.set("StegFormer run completed")
@@ -1,38 +1,100 @@
 # lsb/lsb_stego.py
-from PIL import Image
 import numpy as np
-from steganography import Steganography  # import from your friend's module
+from steganography import Steganography, MAX_HEADER_BITS  # import from your friend's module
+
+try:
+    from lsb.lsb_stego_numba import hide_nibbles as _hide_nibbles_jit
+    from lsb.lsb_stego_numba import reveal_nibbles as _reveal_nibbles_jit
+except ImportError:
+    _hide_nibbles_jit = _reveal_nibbles_jit = None
+
+# Same layout as Steganography.hide_image_in_image (whose header helpers
+# are reused): "WxH<<DIM>>" header in the 1-bit LSBs from pixel 0, then the
+# secret's 4 MSBs in the cover's 4 LSBs starting on the row after the header.
+
+# Below this body size the numpy SWAR path beats the Numba prange kernels
+# (thread start-up dominates); measured crossover is between 256² and 512².
+NUMBA_MIN_BYTES = 1 << 19
+
+
+# SWAR: one uint64 lane carries 8 channel bytes, masks repeat per byte
+SWAR_HI = np.uint64(0xF0F0F0F0F0F0F0F0)
+SWAR_LO = np.uint64(0x0F0F0F0F0F0F0F0F)
+
+
+def _swar_split(arr):
+    """uint64 view over the 8-byte aligned prefix of a C-contiguous array + uint8 tail."""
+    flat = arr.reshape(-1)
+    n = flat.size - flat.size % 8
+    return flat[:n].view(np.uint64), flat[n:]
+
+def _hide_nibbles_np(cover, secret, out):
+    if not (cover.flags.c_contiguous and secret.flags.c_contiguous and out.flags.c_contiguous):
+        np.bitwise_or(cover & 0xF0, secret >> 4, out=out)
+        return
+    c64, c8 = _swar_split(cover)
+    s64, s8 = _swar_split(secret)
+    o64, o8 = _swar_split(out)
+    np.bitwise_or(c64 & SWAR_HI, (s64 >> 4) & SWAR_LO, out=o64)
+    np.bitwise_or(c8 & 0xF0, s8 >> 4, out=o8)
+
+def _reveal_nibbles_np(stego, out):
+    if not (stego.flags.c_contiguous and out.flags.c_contiguous):
+        low = stego & 0x0F
+        np.bitwise_or(low << 4, low, out=out)
+        return
+    s64, s8 = _swar_split(stego)
+    o64, o8 = _swar_split(out)
+    low = s64 & SWAR_LO
+    np.bitwise_or(low << 4, low, out=o64)
+    low = s8 & 0x0F
+    np.bitwise_or(low << 4, low, out=o8)
+
+def hide_nibbles(cover, secret, out):
+    if _hide_nibbles_jit is not None and out.nbytes >= NUMBA_MIN_BYTES:
+        _hide_nibbles_jit(cover, secret, out)
+    else:
+        _hide_nibbles_np(cover, secret, out)
+
+def reveal_nibbles(stego, out):
+    if _reveal_nibbles_jit is not None and out.nbytes >= NUMBA_MIN_BYTES:
+        _reveal_nibbles_jit(stego, out)
+    else:
+        _reveal_nibbles_np(stego, out)
+
 
 def lsb_hide(cover_img: np.ndarray, secret_img: np.ndarray) -> np.ndarray:
     """
-    Use friend's hide_image_in_image logic but work in-memory.
+    Friend's hide_image_in_image layout, as in-memory bit ops.
     """
-    # Convert numpy -> PIL and save to temp paths
-    cover = Image.fromarray(cover_img.astype("uint8"))
-    secret = Image.fromarray(secret_img.astype("uint8"))
+    stego = np.array(cover_img, dtype=np.uint8)  # copy, caller's array untouched
+    secret = np.asarray(secret_img, dtype=np.uint8)
+    h, w = stego.shape[:2]
+    sh, sw = secret.shape[:2]
+    if sh > h or sw > w:
+        # needs the friend's resize-to-fit step
+        return Steganography.hide_image_array(cover_img, secret_img)
 
-    cover.save("tmp_cover.png")
-    secret.save("tmp_secret.png")
-
-    out_path = "tmp_stego.png"
-    ok = Steganography.hide_image_in_image("tmp_cover.png", "tmp_secret.png", out_path)
-    if not ok:
-        raise RuntimeError("LSB hide failed")
-
-    stego = np.array(Image.open(out_path).convert("RGB"))
+    start_y = Steganography._embed_dim_header(stego, sw, sh)
+    rows = max(0, min(sh, h - start_y))
+    body = stego[start_y:start_y + rows, :sw]
+    hide_nibbles(body, secret[:rows], body)
     return stego
 
 def lsb_reveal(stego_img: np.ndarray) -> np.ndarray:
     """
-    Use friend's extract_image_from_image logic.
+    Friend's extract_image_from_image layout, as in-memory bit ops.
     """
-    stego = Image.fromarray(stego_img.astype("uint8"))
-    stego.save("tmp_stego_for_extract.png")
-
-    out_path = "tmp_secret_rec.png"
-    ok = Steganography.extract_image_from_image("tmp_stego_for_extract.png", out_path)
-    if not ok:
-        raise RuntimeError("LSB extract failed")
+    stego = np.asarray(stego_img, dtype=np.uint8)
+    h, w = stego.shape[:2]
+    probe = Steganography._pack_lsbs(stego.reshape(-1)[:MAX_HEADER_BITS])
+    try:
+        sw, sh, start_y = Steganography._parse_dim_header(probe, w)
+    except ValueError as e:
+        raise RuntimeError("LSB extract failed") from e
 
-    secret_rec = np.array(Image.open(out_path).convert("RGB"))
+    secret_rec = np.zeros((sh, sw, 3), dtype=np.uint8)
+    rows = max(0, min(sh, h - start_y))
+    cols = min(sw, w)
+    reveal_nibbles(stego[start_y:start_y + rows, :cols], secret_rec[:rows, :cols])
     return secret_rec
@@ -0,0 +1,57 @@
+# lsb/lsb_stego_numba.py
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def hide_nibbles(cover, secret, out):
+    """
+    4 MSBs of secret -> 4 LSBs of cover, written into out (HWC uint8).
+    out may alias cover.
+    """
+    h, w, ch = cover.shape
+    for y in prange(h):
+        for x in range(w):
+            for c in range(ch):
+                out[y, x, c] = (cover[y, x, c] & 0xF0) | ((secret[y, x, c] >> 4) & 0x0F)
+
+
+@njit(parallel=True, cache=True)
+def reveal_nibbles(stego, out):
+    """
+    4 LSBs of stego -> 4 MSBs of out, duplicated into the low nibble.
+    """
+    h, w, ch = stego.shape
+    for y in prange(h):
+        for x in range(w):
+            for c in range(ch):
+                low = stego[y, x, c] & 0x0F
+                out[y, x, c] = (low << 4) | low
+
+
+@njit(parallel=True, cache=True)
+def embed_lsb(flat, bits):
+    """
+    bits (0/1 uint8) -> LSBs of flat[:bits.size], in place (1-D uint8).
+    """
+    for i in prange(bits.size):
+        flat[i] = (flat[i] & 0xFE) | bits[i]
+
+
+# Multiply-gather (portable PEXT with mask 0x0101...01): the LSB of byte k
+# of a little-endian word lands in bit 7-k of the top byte.
+_LSB_MASK = np.uint64(0x0101010101010101)
+_LSB_GATHER = np.uint64(0x8040201008040201)
+
+
+@njit(cache=True)
+def pack_lsbs(flat, out):
+    """
+    LSBs of flat (1-D uint8) packed 8 per byte into out, first byte in the
+    MSB (np.packbits order). Uses out.size * 8 bytes of flat.
+    """
+    for i in range(out.size):
+        w = np.uint64(0)
+        for k in range(8):
+            w |= np.uint64(flat[8 * i + k]) << np.uint64(8 * k)
+        out[i] = ((w & _LSB_MASK) * _LSB_GATHER) >> np.uint64(56)
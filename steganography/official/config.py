@@ -26,6 +26,10 @@ class Args:
     epochs = 6000
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
+    # inference precision on CUDA: 'fp16', 'bf16' (Ampere+) or 'fp32'.
+    # CPU inference always runs in fp32.
+    infer_precision = 'fp16'
+
     val_freq = 10
     save_freq = 200
     train_next = 0
@@ -4,28 +4,74 @@ Uses LSB (Least Significant Bit) technique to hide data in images
 """
 
 from PIL import Image
+import numpy as np
 import os
 
+try:
+    from lsb.lsb_stego_numba import embed_lsb as _embed_lsb_jit
+    from lsb.lsb_stego_numba import pack_lsbs as _pack_lsbs_jit
+except ImportError:
+    _embed_lsb_jit = _pack_lsbs_jit = None
+
+# Payloads at least this many bits long use the single-pass Numba kernel;
+# below it the NumPy masked assignment is as fast.
+NUMBA_MIN_BITS = 1 << 20
+
+# Image-in-image header: "WxH<<DIM>>" in the 1-bit LSBs from pixel 0
+DIM_DELIM = b"<<DIM>>"
+MAX_HEADER_BITS = 500 * 8  # Maximum expected header size in bits (increased for safety)
+
 
 class Steganography:
     """Class for hiding and extracting data from images using LSB steganography"""
 
     @staticmethod
-    def _string_to_binary(data):
-        """Convert string to binary format"""
+    def _to_bits(data):
+        """Convert str (one byte per char) or bytes to a uint8 array of 0/1 bits, MSB first"""
         if isinstance(data, str):
-            return "".join([format(ord(char), "08b") for char in data])
-        elif isinstance(data, bytes):
-            return "".join([format(byte, "08b") for byte in data])
+            data = data.encode("latin-1")
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+    @staticmethod
+    def _from_bits(bits):
+        """Convert a 0/1 bit array back to bytes (last byte zero-padded)"""
+        return np.packbits(bits).tobytes()
+
+    @staticmethod
+    def _pack_lsbs(flat):
+        """LSBs of a 1-D uint8 array as bytes, 8 per byte MSB first; a trailing partial byte is dropped"""
+        n = flat.size // 8
+        if _pack_lsbs_jit is None:
+            return Steganography._from_bits(flat[: n * 8] & 1)
+        out = np.empty(n, dtype=np.uint8)
+        _pack_lsbs_jit(flat, out)
+        return out.tobytes()
 
     @staticmethod
-    def _binary_to_string(binary_data):
-        """Convert binary data back to string"""
-        chars = []
-        for i in range(0, len(binary_data), 8):
-            byte = binary_data[i : i + 8]
-            chars.append(chr(int(byte, 2)))
-        return "".join(chars)
+    def _embed_lsb(img, bits):
+        """Write a 0/1 uint8 array into the channel LSBs of an RGB image, row-major from pixel 0"""
+        # Only the top rows the bits reach go through Python-visible memory:
+        # one tobytes() of that band, edited in place, pasted into a C copy
+        width = img.width
+        rows = -(-bits.size // (width * 3))
+        band = img if rows >= img.height else img.crop((0, 0, width, rows))
+        raw = bytearray(band.tobytes())
+        flat = np.frombuffer(raw, dtype=np.uint8)  # shares memory with raw
+        n = bits.size
+        if _embed_lsb_jit is not None and n >= NUMBA_MIN_BITS:
+            _embed_lsb_jit(flat, bits)
+        else:
+            # Two in-place passes over the contiguous prefix, no temporaries
+            seg = flat[:n]
+            np.bitwise_and(seg, 0xFE, out=seg)
+            np.bitwise_or(seg, bits, out=seg)
+
+        band_img = Image.frombytes("RGB", band.size, raw)
+        if rows >= img.height:
+            return band_img
+        stego_img = img.copy()
+        stego_img.paste(band_img, (0, 0))
+        return stego_img
 
     @staticmethod
     def hide_text_in_image(image_path, secret_text, output_path):
@@ -54,9 +100,9 @@ class Steganography:
             # Add delimiter to mark end of message
             secret_text += "<<END>>"
 
-            # Convert message to binary
-            binary_message = Steganography._string_to_binary(secret_text)
-            data_length = len(binary_message)
+            # Convert message to a 0/1 bit array
+            bits = Steganography._to_bits(secret_text)
+            data_length = bits.size
 
             # Check if image can hold the message
             max_bytes = width * height * 3  # 3 color channels
@@ -65,32 +111,8 @@ class Steganography:
                     f"Image is too small to hide this message. Max capacity: {max_bytes} bits"
                 )
 
-            # Hide data in image
-            data_index = 0
-            pixels = img.load()
-
-            for y in range(height):
-                for x in range(width):
-                    if data_index < data_length:
-                        pixel = list(pixels[x, y])
-
-                        # Modify RGB channels
-                        for channel in range(3):
-                            if data_index < data_length:
-                                # Replace LSB with message bit
-                                pixel[channel] = pixel[channel] & ~1 | int(
-                                    binary_message[data_index]
-                                )
-                                data_index += 1
-
-                        pixels[x, y] = tuple(pixel)
-                    else:
-                        break
-                if data_index >= data_length:
-                    break
-
-            # Save the stego image
-            img.save(output_path)
+            # Hide data in image and save the stego image
+            Steganography._embed_lsb(img, bits).save(output_path)
             return True
 
         except Exception as e:
@@ -116,35 +138,108 @@ class Steganography:
             if img.mode != "RGB":
                 img = img.convert("RGB")
 
-            width, height = img.size
-            pixels = img.load()
+            # Extract LSBs from image, 8 per byte
+            flat = np.frombuffer(img.tobytes(), dtype=np.uint8)
+            data = Steganography._pack_lsbs(flat)
 
-            binary_message = ""
+            # Check for end delimiter
+            end = data.find(b"<<END>>")
+            if end != -1:
+                return data[:end].decode("latin-1")
 
-            # Extract LSBs from image
-            for y in range(height):
-                for x in range(width):
-                    pixel = pixels[x, y]
+            # No delimiter: everything, with a trailing partial byte
+            # right-aligned as int(bits, 2) would read it
+            tail = flat.size % 8
+            if tail:
+                last = Steganography._from_bits(flat[-tail:] & 1)[0]
+                data += bytes([last >> (8 - tail)])
+            return data.decode("latin-1")
 
-                    for channel in range(3):
-                        binary_message += str(pixel[channel] & 1)
+        except Exception as e:
+            print(f"Error extracting text: {e}")
+            return None
 
-            # Convert binary to string
-            message = ""
-            for i in range(0, len(binary_message), 8):
-                byte = binary_message[i : i + 8]
-                char = chr(int(byte, 2))
-                message += char
+    @staticmethod
+    def _hide_image(cover_img, secret_img):
+        """Embed secret_img into a copy of cover_img (both RGB PIL images)"""
+        # Get dimensions
+        cover_width, cover_height = cover_img.size
+        secret_width, secret_height = secret_img.size
+
+        # Check if secret image can fit in cover image
+        if secret_width > cover_width or secret_height > cover_height:
+            # Resize secret image to fit
+            secret_img = secret_img.resize(
+                (min(secret_width, cover_width), min(secret_height, cover_height))
+            )
+            secret_width, secret_height = secret_img.size
 
-                # Check for end delimiter
-                if message.endswith("<<END>>"):
-                    return message[:-7]  # Remove delimiter
+        # Create a copy of cover image
+        stego = np.array(cover_img, dtype=np.uint8)
+        secret = np.asarray(secret_img, dtype=np.uint8)
 
-            return message
+        # Encode secret image dimensions at the start
+        start_y = Steganography._embed_dim_header(stego, secret_width, secret_height)
 
-        except Exception as e:
-            print(f"Error extracting text: {e}")
-            return None
+        # Hide secret image pixels (using 4 LSBs for better quality):
+        # 4 MSBs of secret into the 4 LSBs of the cover, rows past the
+        # bottom of the cover are dropped
+        rows = max(0, min(secret_height, cover_height - start_y))
+        region = stego[start_y : start_y + rows, :secret_width]
+        np.bitwise_and(region, 0xF0, out=region)
+        np.bitwise_or(region, secret[:rows] >> 4, out=region)
+
+        return Image.fromarray(stego)
+
+    @staticmethod
+    def _embed_dim_header(stego, secret_width, secret_height):
+        """
+        Write the "WxH<<DIM>>" header into the LSBs of an HWC uint8 array in
+        place and return the first row of the image data
+        """
+        binary_dim = Steganography._to_bits(
+            f"{secret_width}x{secret_height}".encode() + DIM_DELIM
+        )
+
+        # Hide dimensions in LSBs (cut short if the cover is tiny)
+        flat = stego.reshape(-1)
+        n = min(binary_dim.size, flat.size)
+        seg = flat[:n]
+        np.bitwise_and(seg, 0xFE, out=seg)
+        np.bitwise_or(seg, binary_dim[:n], out=seg)
+        header_pixels_used = (n + 2) // 3
+
+        # Skip the header area, plus one row of padding so we don't overlap
+        return (header_pixels_used // stego.shape[1]) + 1
+
+    @staticmethod
+    def _parse_dim_header(probe, width):
+        """
+        Parse the "WxH<<DIM>>" header from the packed LSBs of the header area
+
+        Returns:
+            (secret_width, secret_height, first row of the image data)
+
+        Raises:
+            ValueError: If no dimension header is found
+        """
+        delim_at = probe.find(DIM_DELIM)
+        if delim_at != -1:
+            try:
+                # Non-ASCII bytes can never parse as dimensions
+                dim_str = probe[:delim_at].decode("ascii", errors="replace")
+                secret_width, secret_height = map(int, dim_str.split("x"))
+            except ValueError:
+                pass
+            else:
+                # Pixels up to and including the delimiter's last bit
+                header_bits = (delim_at + len(DIM_DELIM)) * 8
+                header_pixels_used = (header_bits + 2) // 3
+                return secret_width, secret_height, (header_pixels_used // width) + 1
+
+        raise ValueError(
+            "Could not find dimension header in image. This may not be a valid stego image with a hidden image."
+        )
 
     @staticmethod
     def hide_image_in_image(cover_image_path, secret_image_path, output_path):
@@ -161,84 +256,21 @@ class Steganography:
         """
         try:
             # Open both images
-            cover_img = Image.open(cover_image_path).convert("RGB")
-            secret_img = Image.open(secret_image_path).convert("RGB")
+            cover_img = Image.open(cover_image_path)
+            secret_img = Image.open(secret_image_path)
 
-            # Get dimensions
-            cover_width, cover_height = cover_img.size
-            secret_width, secret_height = secret_img.size
+            # Convert to RGB if necessary
+            if cover_img.mode != "RGB":
+                cover_img = cover_img.convert("RGB")
+            if secret_img.mode != "RGB":
+                secret_img = secret_img.convert("RGB")
 
-            # Check if secret image can fit in cover image
-            if secret_width > cover_width or secret_height > cover_height:
-                # Resize secret image to fit
-                secret_img = secret_img.resize(
-                    (min(secret_width, cover_width), min(secret_height, cover_height))
-                )
-                secret_width, secret_height = secret_img.size
-
-            # Create a copy of cover image
-            stego_img = cover_img.copy()
-            cover_pixels = stego_img.load()
-            secret_pixels = secret_img.load()
-
-            # Encode secret image dimensions at the start
-            dim_data = f"{secret_width}x{secret_height}<<DIM>>"
-            binary_dim = Steganography._string_to_binary(dim_data)
-
-            data_index = 0
-            header_pixels_used = 0
-
-            # Hide dimensions first in LSBs
-            for y in range(cover_height):
-                for x in range(cover_width):
-                    if data_index < len(binary_dim):
-                        pixel = list(cover_pixels[x, y])
-                        for channel in range(3):
-                            if data_index < len(binary_dim):
-                                pixel[channel] = pixel[channel] & ~1 | int(
-                                    binary_dim[data_index]
-                                )
-                                data_index += 1
-                        cover_pixels[x, y] = tuple(pixel)
-                        header_pixels_used += 1
-                    else:
-                        break
-                if data_index >= len(binary_dim):
-                    break
-
-            print(f"Header stored in {header_pixels_used} pixels")
-
-            # Calculate starting position for image data (skip header area)
-            # Add some padding to ensure we don't overlap
-            start_y = (header_pixels_used // cover_width) + 1
-            start_x = 0
-
-            # Hide secret image pixels (using 4 LSBs for better quality)
-            # Start from position after header
-            for sy in range(secret_height):
-                for sx in range(secret_width):
-                    secret_pixel = secret_pixels[sx, sy]
-
-                    # Calculate position in cover image (offset by header size)
-                    cx = sx + start_x
-                    cy = sy + start_y
-
-                    if cx < cover_width and cy < cover_height:
-                        cover_pixel = list(cover_pixels[cx, cy])
-
-                        # Hide 4 MSBs of secret in 4 LSBs of cover
-                        for channel in range(3):
-                            # Get 4 most significant bits from secret
-                            secret_bits = (secret_pixel[channel] >> 4) & 0x0F
-                            # Clear 4 LSBs of cover and set them to secret bits
-                            cover_pixel[channel] = (
-                                cover_pixel[channel] & 0xF0
-                            ) | secret_bits
-
-                        cover_pixels[cx, cy] = tuple(cover_pixel)
+            stego_img = Steganography._hide_image(cover_img, secret_img)
 
             # Save the stego image
             stego_img.save(output_path)
+            secret_width = min(secret_img.width, cover_img.width)
+            secret_height = min(secret_img.height, cover_img.height)
             print(f"Image hidden successfully: {secret_width}x{secret_height}")
             return True
 
@@ -249,6 +281,53 @@ class Steganography:
             traceback.print_exc()
             return False
 
+    @staticmethod
+    def hide_image_array(cover_np, secret_np):
+        """
+        Hide one image inside another image without touching the disk
+
+        Args:
+            cover_np: Cover image as HWC uint8 array
+            secret_np: Secret image as HWC uint8 array
+
+        Returns:
+            Stego image as HWC uint8 array
+        """
+        cover_img = Image.fromarray(np.asarray(cover_np, dtype=np.uint8))
+        secret_img = Image.fromarray(np.asarray(secret_np, dtype=np.uint8))
+        return np.asarray(Steganography._hide_image(cover_img, secret_img))
+
+    @staticmethod
+    def _extract_image(stego_img):
+        """Recover the image hidden in stego_img (RGB PIL image)"""
+        width, height = stego_img.size
+
+        # Extract dimensions from LSBs (only the header area, 8 bits per byte)
+        header_rows = min(height, -(-MAX_HEADER_BITS // (width * 3)))
+        header_band = stego_img.crop((0, 0, width, header_rows)).tobytes()
+        probe = Steganography._pack_lsbs(
+            np.frombuffer(header_band, dtype=np.uint8)[:MAX_HEADER_BITS]
+        )
+        secret_width, secret_height, start_y = Steganography._parse_dim_header(probe, width)
+
+        # Extract hidden image pixels (using 4 LSBs) from offset position:
+        # shift to MSBs and duplicate into the lower bits for better quality,
+        # written straight into the preallocated output.
+        extracted = np.empty((secret_height, secret_width, 3), dtype=np.uint8)
+        rows = max(0, min(secret_height, height - start_y))
+        cols = min(secret_width, width)
+        body = stego_img.crop((0, start_y, cols, start_y + rows)).tobytes()
+        out = extracted[:rows, :cols]
+        np.bitwise_and(np.frombuffer(body, dtype=np.uint8).reshape(rows, cols, 3), 0x0F, out=out)
+        np.multiply(out, 0x11, out=out)  # (low << 4) | low
+
+        # Rows that did not fit in the cover stay black
+        extracted[rows:] = 0
+        extracted[:rows, cols:] = 0
+        extracted_img = Image.fromarray(extracted)
+
+        return extracted_img
+
     @staticmethod
     def extract_image_from_image(stego_image_path, output_path):
         """
@@ -263,99 +342,15 @@ class Steganography:
         """
         try:
             # Open the stego image
-            stego_img = Image.open(stego_image_path).convert("RGB")
-            width, height = stego_img.size
-            pixels = stego_img.load()
-
-            # Extract dimensions from LSBs (more efficient - only extract what we need)
-            binary_message = ""
-            max_header_bits = (
-                500 * 8
-            )  # Maximum expected header size in bits (increased for safety)
-            bit_count = 0
-            found_delimiter = False
-            secret_width = 0
-            secret_height = 0
-            header_pixels_used = 0
-
-            for y in range(height):
-                for x in range(width):
-                    if bit_count >= max_header_bits:
-                        break
-                    pixel = pixels[x, y]
-                    for channel in range(3):
-                        binary_message += str(pixel[channel] & 1)
-                        bit_count += 1
-
-                        # Check every 8 bits if we have the delimiter
-                        if bit_count % 8 == 0 and bit_count >= 64:  # Minimum size check
-                            try:
-                                temp_msg = ""
-                                for i in range(0, len(binary_message), 8):
-                                    byte = binary_message[i : i + 8]
-                                    if len(byte) == 8:
-                                        byte_val = int(byte, 2)
-                                        if (
-                                            byte_val < 128
-                                        ):  # Valid ASCII range for header
-                                            temp_msg += chr(byte_val)
-                                        else:
-                                            temp_msg += "?"
-                                if "<<DIM>>" in temp_msg:
-                                    dim_str = temp_msg.split("<<DIM>>")[0]
-                                    secret_width, secret_height = map(
-                                        int, dim_str.split("x")
-                                    )
-                                    found_delimiter = True
-                                    header_pixels_used = (
-                                        bit_count + 2
-                                    ) // 3  # Calculate pixels used
-                                    break
-                            except (ValueError, IndexError):
-                                # Continue searching if parsing fails
-                                pass
-                    if found_delimiter:
-                        header_pixels_used = y * width + x + 1
-                        break
-                if found_delimiter:
-                    break
-
-            if not found_delimiter:
-                raise ValueError(
-                    "Could not find dimension header in image. This may not be a valid stego image with a hidden image."
-                )
-
-            print(f"Found hidden image dimensions: {secret_width}x{secret_height}")
-            print(f"Header used {header_pixels_used} pixels")
-
-            # Calculate starting position for image data (skip header area)
-            start_y = (header_pixels_used // width) + 1
-            start_x = 0
-
-            # Create new image for extracted data
-            extracted_img = Image.new("RGB", (secret_width, secret_height))
-            extracted_pixels = extracted_img.load()
-
-            # Extract hidden image pixels (using 4 LSBs) from offset position
-            for sy in range(secret_height):
-                for sx in range(secret_width):
-                    # Calculate position in stego image (offset by header size)
-                    cx = sx + start_x
-                    cy = sy + start_y
+            stego_img = Image.open(stego_image_path)
+            if stego_img.mode != "RGB":
+                stego_img = stego_img.convert("RGB")
 
-                    if cx < width and cy < height:
-                        stego_pixel = pixels[cx, cy]
-
-                        # Extract 4 LSBs and shift to MSBs, then fill lower bits
-                        extracted_pixel = []
-                        for channel in range(3):
-                            # Get 4 LSBs and shift them to MSBs
-                            hidden_bits = (stego_pixel[channel] & 0x0F) << 4
-                            # Duplicate the 4 bits to fill the lower 4 bits for better quality
-                            hidden_bits = hidden_bits | ((stego_pixel[channel] & 0x0F))
-                            extracted_pixel.append(hidden_bits)
-
-                        extracted_pixels[sx, sy] = tuple(extracted_pixel)
+            extracted_img = Steganography._extract_image(stego_img)
+            print(
+                f"Found hidden image dimensions: "
+                f"{extracted_img.width}x{extracted_img.height}"
+            )
 
             # Save the extracted image
             extracted_img.save(output_path)
@@ -396,41 +391,24 @@ class Steganography:
             # Combine header and data
             full_data = header.encode() + secret_data + b"<<END>>"
 
-            # Convert to binary
-            binary_data = Steganography._string_to_binary(full_data)
+            # Convert to a 0/1 bit array
+            bits = Steganography._to_bits(full_data)
 
             # Open the cover image
-            img = Image.open(cover_image_path).convert("RGB")
+            img = Image.open(cover_image_path)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
             width, height = img.size
 
             # Check capacity
             max_bytes = width * height * 3
-            if len(binary_data) > max_bytes:
+            if bits.size > max_bytes:
                 raise ValueError(
-                    f"Image too small. Need {len(binary_data)} bits, have {max_bytes}"
+                    f"Image too small. Need {bits.size} bits, have {max_bytes}"
                 )
 
             # Hide data
-            pixels = img.load()
-            data_index = 0
-
-            for y in range(height):
-                for x in range(width):
-                    if data_index < len(binary_data):
-                        pixel = list(pixels[x, y])
-                        for channel in range(3):
-                            if data_index < len(binary_data):
-                                pixel[channel] = pixel[channel] & ~1 | int(
-                                    binary_data[data_index]
-                                )
-                                data_index += 1
-                        pixels[x, y] = tuple(pixel)
-                    else:
-                        break
-                if data_index >= len(binary_data):
-                    break
-
-            img.save(output_path)
+            Steganography._embed_lsb(img, bits).save(output_path)
             return True
 
         except Exception as e:
@@ -451,24 +429,11 @@ class Steganography:
         """
         try:
             # Open the stego image
-            img = Image.open(stego_image_path).convert("RGB")
-            width, height = img.size
-            pixels = img.load()
-
-            # Extract binary data
-            binary_data = ""
-            for y in range(height):
-                for x in range(width):
-                    pixel = pixels[x, y]
-                    for channel in range(3):
-                        binary_data += str(pixel[channel] & 1)
-
-            # Convert to bytes
-            byte_data = bytearray()
-            for i in range(0, len(binary_data), 8):
-                byte = binary_data[i : i + 8]
-                if len(byte) == 8:
-                    byte_data.append(int(byte, 2))
+            img = Image.open(stego_image_path)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            # Extract LSBs and pack them, whole bytes only
+            byte_data = Steganography._pack_lsbs(np.frombuffer(img.tobytes(), dtype=np.uint8))
 
             # Find header
             header_end = byte_data.find(b"<<HEADER>>")
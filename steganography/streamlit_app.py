@@ -4,68 +4,86 @@ import zipfile
 import datetime
 import time  # ADD THIS
 
+import numpy as np
 import streamlit as st
+import torch
 from PIL import Image
 
-from utils.image_io import pil_to_numpy, numpy_to_pil
-from utils.metrics import compute_psnr, compute_ssim
+from utils.image_io import load_image, pil_to_numpy, numpy_to_pil
+from utils.metrics import compute_metrics_batch, compute_psnr_torch, compute_ssim_torch
 from lsb.lsb_stego import lsb_hide, lsb_reveal
-from stegformer_infer import StegFormerInfer
+from stegformer_infer import get_stegformer
 
 STEGO_SIZE = (256, 256)
 DISPLAY_WIDTH = 220  # image width in UI
 
+# Bounds for the st.cache_data caches below (shared by all sessions):
+# a handful of uploads, their PNGs (2 inputs + 2 per algorithm) and ZIPs
+CACHE_TTL = "1h"
+CACHE_MAX_INPUTS = 16
+CACHE_MAX_PNGS = 64
+CACHE_MAX_ZIPS = 8
+
 @st.cache_resource
 def load_stegformer(weights_path: str):
-    return StegFormerInfer(weights_path)
+    return get_stegformer(weights_path)
 
 def resize_256(img: Image.Image) -> Image.Image:
     return img.resize(STEGO_SIZE, Image.BICUBIC)
 
-def build_zip(cover_np, secret_np, results, metrics_all):
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_INPUTS, ttl=CACHE_TTL)
+def load_and_resize(file_bytes: bytes) -> np.ndarray:
+    """Decode + resize an upload to 256×256 HWC uint8, cached on its raw bytes."""
+    # Resized straight from the decoded PIL image: one array conversion, at 256×256
+    return pil_to_numpy(resize_256(load_image(io.BytesIO(file_bytes))))
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_PNGS, ttl=CACHE_TTL)
+def encode_png(arr: np.ndarray) -> bytes:
+    """PNG bytes of an HWC uint8 image, cached across reruns."""
+    buf = io.BytesIO()
+    # Level 1: a fraction of the default level-6 deflate time for slightly larger files
+    numpy_to_pil(arr).save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ZIPS, ttl=CACHE_TTL)
+def build_zip(cover_np, secret_np, results, metrics_all) -> bytes:
     """
-    Build a ZIP file in memory containing:
+    Build a ZIP file in memory (cached: reruns with unchanged inputs and
+    results return the same bytes without rebuilding) containing:
       - cover_256.png
       - secret_256.png
       - <algo>_stego.png
       - <algo>_recovered.png
       - metrics.csv
+    results holds PNG bytes encoded when each algorithm ran.
     """
     buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+    # PNGs are already deflated; only the CSV is worth compressing again
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
         # inputs
-        cov_buf = io.BytesIO()
-        numpy_to_pil(cover_np).save(cov_buf, format="PNG")
-        zf.writestr("cover_256.png", cov_buf.getvalue())
-
-        sec_buf = io.BytesIO()
-        numpy_to_pil(secret_np).save(sec_buf, format="PNG")
-        zf.writestr("secret_256.png", sec_buf.getvalue())
+        zf.writestr("cover_256.png", encode_png(cover_np))
+        zf.writestr("secret_256.png", encode_png(secret_np))
 
         # per‑algorithm outputs
-        for name, (stego_np, rec_np, _) in results.items():
-            s_buf = io.BytesIO()
-            numpy_to_pil(stego_np).save(s_buf, format="PNG")
-            zf.writestr(f"{name.lower()}_stego.png", s_buf.getvalue())
-
-            r_buf = io.BytesIO()
-            numpy_to_pil(rec_np).save(r_buf, format="PNG")
-            zf.writestr(f"{name.lower()}_recovered.png", r_buf.getvalue())
+        for name, (stego_png, rec_png, _) in results.items():
+            zf.writestr(f"{name.lower()}_stego.png", stego_png)
+            zf.writestr(f"{name.lower()}_recovered.png", rec_png)
 
         # metrics.csv - ADD INFERENCE TIME
-        csv_buf = io.StringIO()
-        csv_buf.write("algorithm,cover_psnr,cover_ssim,secret_psnr,secret_ssim,inference_time_ms\n")
-        for name, m in metrics_all.items():
-            if m is None:
-                continue
-            csv_buf.write(
-                f"{name},{m['cov_psnr']:.4f},{m['cov_ssim']:.4f},"
-                f"{m['sec_psnr']:.4f},{m['sec_ssim']:.4f},{m['inference_time']:.2f}\n"
-            )
-        zf.writestr("metrics.csv", csv_buf.getvalue())
+        # Streamed straight into the (deflated) entry, no intermediate string
+        csv_info = zipfile.ZipInfo("metrics.csv", time.localtime()[:6])
+        csv_info.compress_type = zipfile.ZIP_DEFLATED
+        with zf.open(csv_info, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as csv_f:
+            csv_f.write("algorithm,cover_psnr,cover_ssim,secret_psnr,secret_ssim,inference_time_ms\n")
+            for name, m in metrics_all.items():
+                if m is None:
+                    continue
+                csv_f.write(
+                    f"{name},{m['cov_psnr']:.4f},{m['cov_ssim']:.4f},"
+                    f"{m['sec_psnr']:.4f},{m['sec_ssim']:.4f},{m['inference_time']:.2f}\n"
+                )
 
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
 
 def main():
     st.set_page_config(page_title="Steganography Lab", layout="wide")
@@ -77,7 +95,7 @@ def main():
 
     # ---------- session state for results ----------
     if "lsb_result" not in st.session_state:
-        st.session_state.lsb_result = None  # (stego_np, rec_np, metrics_dict)
+        st.session_state.lsb_result = None  # (stego_png, rec_png, metrics_dict)
     if "steg_result" not in st.session_state:
         st.session_state.steg_result = None
 
@@ -102,17 +120,16 @@ def main():
         st.info("Upload both cover and secret images to run comparisons.")
         return
 
-    cover_pil = resize_256(Image.open(cover_file).convert("RGB"))
-    secret_pil = resize_256(Image.open(secret_file).convert("RGB"))
-    cover_np = pil_to_numpy(cover_pil)
-    secret_np = pil_to_numpy(secret_pil)
+    # Reruns (any widget click) hit the cache instead of decoding again
+    cover_np = load_and_resize(cover_file.getvalue())
+    secret_np = load_and_resize(secret_file.getvalue())
 
     st.write("Preview (both resized to 256×256):")
     p1, p2 = st.columns(2, gap="small")
     with p1:
-        st.image(cover_pil, caption="Cover (256×256)", width=DISPLAY_WIDTH)
+        st.image(encode_png(cover_np), caption="Cover (256×256)", width=DISPLAY_WIDTH)
     with p2:
-        st.image(secret_pil, caption="Secret (256×256)", width=DISPLAY_WIDTH)
+        st.image(encode_png(secret_np), caption="Secret (256×256)", width=DISPLAY_WIDTH)
 
     # ---------- 2. Run algorithms ----------
     st.markdown("---")
@@ -132,32 +149,38 @@ def main():
             rec = lsb_reveal(stego)
             inference_time = (time.time() - start_time) * 1000  # ms
             
-            cov_psnr = compute_psnr(cover_np, stego)
-            cov_ssim = compute_ssim(cover_np, stego)
-            sec_psnr = compute_psnr(secret_np, rec)
-            sec_ssim = compute_ssim(secret_np, rec)
+            cov_m, sec_m = compute_metrics_batch([(cover_np, stego), (secret_np, rec)])
             m = dict(
-                cov_psnr=cov_psnr,
-                cov_ssim=cov_ssim,
-                sec_psnr=sec_psnr,
-                sec_ssim=sec_ssim,
+                cov_psnr=cov_m["psnr"],
+                cov_ssim=cov_m["ssim"],
+                sec_psnr=sec_m["psnr"],
+                sec_ssim=sec_m["ssim"],
                 inference_time=inference_time,  # ADD THIS
             )
-            st.session_state.lsb_result = (stego, rec, m)
+            # Encode once here; display and ZIP export reuse the bytes
+            st.session_state.lsb_result = (encode_png(stego), encode_png(rec), m)
 
     if run_steg:
         with st.spinner("Running StegFormer..."):
             start_time = time.time()
-            cov = cover_np
-            sec = secret_np
-            stego = stegformer.hide(cov, sec)
-            rec = stegformer.reveal(stego)
+            # Images stay on the model's device as uint8 tensors; metrics are
+            # computed there and only the four scalars + two images come back.
+            cov_t = stegformer.upload(cover_np[None], 0)
+            sec_t = stegformer.upload(secret_np[None], 1)
+            stego_t = stegformer.hide_tensor(cov_t, sec_t)
+            rec_t = stegformer.reveal_tensor(stego_t)
+            stegformer.synchronize()
             inference_time = (time.time() - start_time) * 1000  # ms
             
-            cov_psnr = compute_psnr(cov, stego)
-            cov_ssim = compute_ssim(cov, stego)
-            sec_psnr = compute_psnr(sec, rec)
-            sec_ssim = compute_ssim(sec, rec)
+            with torch.inference_mode():
+                cov_psnr, cov_ssim, sec_psnr, sec_ssim = torch.stack([
+                    compute_psnr_torch(cov_t, stego_t),
+                    compute_ssim_torch(cov_t, stego_t),
+                    compute_psnr_torch(sec_t, rec_t),
+                    compute_ssim_torch(sec_t, rec_t),
+                ])[:, 0].tolist()
+            stego = stegformer.download(stego_t)[0]
+            rec = stegformer.download(rec_t)[0]
             m = dict(
                 cov_psnr=cov_psnr,
                 cov_ssim=cov_ssim,
@@ -165,7 +188,7 @@ def main():
                 sec_ssim=sec_ssim,
                 inference_time=inference_time,  # ADD THIS
             )
-            st.session_state.steg_result = (stego, rec, m)
+            st.session_state.steg_result = (encode_png(stego), encode_png(rec), m)
 
     # Build results dict from session_state (persists until buttons are clicked again)
     results = {}
@@ -197,31 +220,31 @@ def main():
         o1, o2 = st.columns(2, gap="small")
         with o1:
             st.image(
-                cover_pil,
+                encode_png(cover_np),
                 caption="Original Cover (256×256)",
                 width=DISPLAY_WIDTH,
             )
         with o2:
             st.image(
-                secret_pil,
+                encode_png(secret_np),
                 caption="Original Secret (256×256)",
                 width=DISPLAY_WIDTH,
             )
 
     # Algorithm tabs
     for tab, name in zip(tabs[1:], algo_names):
-        stego_np, rec_np, m = results[name]
+        stego_png, rec_png, m = results[name]
         with tab:
             col1, col2 = st.columns(2, gap="small")
             with col1:
                 st.image(
-                    numpy_to_pil(stego_np),
+                    stego_png,
                     caption=f"{name} Stego",
                     width=DISPLAY_WIDTH,
                 )
             with col2:
                 st.image(
-                    numpy_to_pil(rec_np),
+                    rec_png,
                     caption=f"{name} Recovered Secret",
                     width=DISPLAY_WIDTH,
                 )
@@ -264,11 +287,11 @@ def main():
     st.markdown("---")
     st.subheader("5. Export results")
 
-    zip_buf = build_zip(cover_np, secret_np, results, metrics_all)
+    zip_bytes = build_zip(cover_np, secret_np, results, metrics_all)
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     st.download_button(
         label="Download all images + metrics as ZIP",
-        data=zip_buf.getvalue(),
+        data=zip_bytes,
         file_name=f"stego_results_{ts}.zip",
         mime="application/zip",
     )
@@ -1,9 +1,74 @@
 # utils/metrics.py
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import torch
+import torch.nn.functional as F
 from skimage.metrics import peak_signal_noise_ratio, structural_similarity
 
+try:
+    from utils.metrics_fast import psnr_u8 as _psnr_u8_jit
+    from utils.metrics_fast import ssim_u8 as _ssim_u8_jit
+except ImportError:
+    _psnr_u8_jit = _ssim_u8_jit = None
+
+SSIM_WIN = 7  # skimage default (uniform window, sample covariance)
+
+def _both_u8(img1, img2):
+    return img1.dtype == np.uint8 and img2.dtype == np.uint8
+
 def compute_psnr(img1: np.ndarray, img2: np.ndarray):
+    # uint8 inputs take the single-pass Numba kernel (same value)
+    if _psnr_u8_jit is not None and _both_u8(img1, img2):
+        return _psnr_u8_jit(img1, img2)
     return peak_signal_noise_ratio(img1, img2, data_range=255)
 
 def compute_ssim(img1: np.ndarray, img2: np.ndarray):
+    if _ssim_u8_jit is not None and _both_u8(img1, img2) and img1.ndim == 3:
+        return _ssim_u8_jit(img1, img2)
     return structural_similarity(img1, img2, channel_axis=2, data_range=255)
+
+def _pair_metrics(pair):
+    img1, img2 = pair
+    return dict(psnr=compute_psnr(img1, img2), ssim=compute_ssim(img1, img2))
+
+def compute_metrics_batch(pairs):
+    # [(ref, test), ...] -> [dict(psnr=..., ssim=...), ...], one per pair.
+    # Pairs are scored on two threads: the serial Numba kernels run without
+    # the GIL, and so do the SciPy filters behind the skimage fallback.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        return list(pool.map(_pair_metrics, pairs))
+
+def compute_psnr_torch(imgs1: torch.Tensor, imgs2: torch.Tensor):
+    # NCHW tensors in [0,255] on any device -> (N,) PSNR, stays on device
+    diff = imgs1.float() - imgs2.float()
+    mse = (diff * diff).mean(dim=(1, 2, 3))
+    return 10 * torch.log10(255.0 ** 2 / mse)
+
+def compute_ssim_torch(imgs1: torch.Tensor, imgs2: torch.Tensor):
+    # NCHW tensors in [0,255] on any device -> (N,) SSIM, stays on device.
+    # Same window as compute_ssim: an unpadded 7x7 mean is exactly the
+    # interior skimage keeps after cropping its filtered maps.
+    x = imgs1.float()
+    y = imgs2.float()
+
+    def mean_filter(t):
+        return F.avg_pool2d(t, SSIM_WIN, stride=1)
+
+    ux = mean_filter(x)
+    uy = mean_filter(y)
+    uxx = mean_filter(x * x)
+    uyy = mean_filter(y * y)
+    uxy = mean_filter(x * y)
+
+    cov_norm = SSIM_WIN ** 2 / (SSIM_WIN ** 2 - 1)
+    vx = cov_norm * (uxx - ux * ux)
+    vy = cov_norm * (uyy - uy * uy)
+    vxy = cov_norm * (uxy - ux * uy)
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    s = ((2 * ux * uy + c1) * (2 * vxy + c2)) / (
+        (ux * ux + uy * uy + c1) * (vx + vy + c2)
+    )
+    return s.mean(dim=(1, 2, 3))
@@ -0,0 +1,85 @@
+# utils/metrics_fast.py
+import numpy as np
+from numba import njit
+
+SSIM_WIN = 7  # keep in sync with utils.metrics.SSIM_WIN
+
+
+@njit(cache=True, nogil=True)
+def psnr_u8(a, b):
+    """
+    PSNR of two uint8 images (any shape), data_range=255.
+    Squared errors are summed exactly in int64. Runs without the GIL.
+    """
+    fa = a.ravel()
+    fb = b.ravel()
+    n = fa.size
+    sse = np.int64(0)
+    for i in range(n):
+        d = np.int64(fa[i]) - np.int64(fb[i])
+        sse += d * d
+    if sse == 0:
+        return np.inf
+    return 10.0 * np.log10(255.0 ** 2 * n / sse)
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def ssim_u8(a, b):
+    """
+    SSIM of two HWC uint8 images with skimage's defaults: 7x7 uniform
+    window, sample covariance, mean over the uncropped interior.
+    Window sums come from int64 summed-area tables, so they are exact.
+    Serial and GIL-free, so callers may run several on their own threads.
+    """
+    h, w, ch = a.shape
+    win = SSIM_WIN
+    n = win * win
+    cov_norm = n / (n - 1.0)
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    oh = h - win + 1
+    ow = w - win + 1
+    if oh < 1 or ow < 1:
+        # same failure as skimage's structural_similarity
+        raise ValueError("win_size exceeds image extent")
+
+    # x, y, x*x, y*y, x*y; row/col 0 stay zero
+    sat = np.zeros((5, h + 1, w + 1), dtype=np.int64)
+    total = 0.0
+    for c in range(ch):
+        for y in range(h):
+            rx = ry = rxx = ryy = rxy = 0
+            for x in range(w):
+                p = np.int64(a[y, x, c])
+                q = np.int64(b[y, x, c])
+                rx += p
+                ry += q
+                rxx += p * p
+                ryy += q * q
+                rxy += p * q
+                sat[0, y + 1, x + 1] = sat[0, y, x + 1] + rx
+                sat[1, y + 1, x + 1] = sat[1, y, x + 1] + ry
+                sat[2, y + 1, x + 1] = sat[2, y, x + 1] + rxx
+                sat[3, y + 1, x + 1] = sat[3, y, x + 1] + ryy
+                sat[4, y + 1, x + 1] = sat[4, y, x + 1] + rxy
+
+        for y in range(oh):
+            y1 = y + win
+            for x in range(ow):
+                x1 = x + win
+                sx = sat[0, y1, x1] - sat[0, y, x1] - sat[0, y1, x] + sat[0, y, x]
+                sy = sat[1, y1, x1] - sat[1, y, x1] - sat[1, y1, x] + sat[1, y, x]
+                sxx = sat[2, y1, x1] - sat[2, y, x1] - sat[2, y1, x] + sat[2, y, x]
+                syy = sat[3, y1, x1] - sat[3, y, x1] - sat[3, y1, x] + sat[3, y, x]
+                sxy = sat[4, y1, x1] - sat[4, y, x1] - sat[4, y1, x] + sat[4, y, x]
+
+                ux = sx / n
+                uy = sy / n
+                vx = cov_norm * (sxx / n - ux * ux)
+                vy = cov_norm * (syy / n - uy * uy)
+                vxy = cov_norm * (sxy / n - ux * uy)
+
+                total += ((2 * ux * uy + c1) * (2 * vxy + c2)) / (
+                    (ux * ux + uy * uy + c1) * (vx + vy + c2)
+                )
+    return total / (oh * ow * ch)
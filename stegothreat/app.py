@@ -4,19 +4,43 @@ from PIL import Image
 import io
 import logging
 
+try:
+    import pyspng  # optional: libspng PNG decoder
+except ImportError:
+    pyspng = None
+
 from lsb_stego import lsb_embed_text, lsb_extract_text
 from hybrid_analyzer import HybridThreatAnalyzer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@st.cache_resource
+def get_analyzer():
+    # One analyzer per server process: YARA rules are compiled once, not per rerun
+    return HybridThreatAnalyzer()
+
+def load_rgb_array(uploaded):
+    """Uploaded image -> HWC uint8 RGB; 8-bit RGB/RGBA PNGs skip PIL via pyspng"""
+    # The only pyspng fast path in the repo: callers here want the full-size
+    # array itself (steganography/ resizes in PIL, where it would not help)
+    data = uploaded.getvalue()
+    # IHDR: bit depth at byte 24, colour type at 25 (2 = RGB, 6 = RGBA)
+    if pyspng is not None and data[:8] == b"\x89PNG\r\n\x1a\n" and data[24:26] in (b"\x08\x02", b"\x08\x06"):
+        arr = pyspng.load(data)
+        return arr if arr.shape[2] == 3 else np.ascontiguousarray(arr[..., :3])
+    image = Image.open(io.BytesIO(data))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.array(image)
+
 st.set_page_config(page_title="StegoThreat Simulator", layout="wide")
 
 st.title("🦠 StegoThreat Simulator")
 
 # Initialize analyzer
 try:
-    analyzer = HybridThreatAnalyzer()
+    analyzer = get_analyzer()
     st.sidebar.success("✅ Analyzer initialized")
 except Exception as e:
     st.error(f"❌ Analyzer init failed: {e}")
@@ -51,26 +75,26 @@ print("REVERSE SHELL CONNECTED!")""",
     if st.button("🚀 SEND INFECTED IMAGE", type="primary") and cover_image and payload:
         try:
             logger.info("Starting embed process")
-            image = Image.open(cover_image).convert("RGB")
-            cover_np = np.array(image)
+            cover_np = load_rgb_array(cover_image)
 
             stego_np = lsb_embed_text(cover_np, payload)
             stego_image = Image.fromarray(stego_np)
 
             stego_buffer = io.BytesIO()
-            stego_image.save(stego_buffer, format="PNG")
-            stego_buffer.seek(0)
-            st.session_state.stego_data = stego_buffer.getvalue()
+            stego_image.save(stego_buffer, format="PNG", compress_level=1)  # fast deflate
+            # Encoded once: preview, download and session state share these bytes
+            stego_png = stego_buffer.getvalue()
+            st.session_state.stego_data = stego_png
 
             col_a, col_b = st.columns(2)
             with col_a:
-                st.image(image, caption="✅ Original", width=300)
+                st.image(cover_np, caption="✅ Original", width=300)
             with col_b:
-                st.image(stego_image, caption="🦠 Infected", width=300)
+                st.image(stego_png, caption="🦠 Infected", width=300)
 
             st.download_button(
                 "💾 Download infected.png",
-                stego_buffer.getvalue(),
+                stego_png,
                 "infected.png",
             )
             st.success(f"✅ {len(payload.encode())} bytes embedded")
@@ -89,8 +113,7 @@ with tab2:
     if st.button("🔍 FULL ANALYSIS", type="primary") and uploaded:
         try:
             logger.info("Starting analysis")
-            image = Image.open(uploaded).convert("RGB")
-            extracted = lsb_extract_text(np.array(image))
+            extracted = lsb_extract_text(load_rgb_array(uploaded))
 
             col1, col2 = st.columns(2)
 
@@ -11,6 +11,11 @@ logger = logging.getLogger(__name__)
 # Load .env file
 load_dotenv()
 
+YARA_SOURCE = "yara_rules.yar"
+YARA_COMPILED = "yara_rules.yarac"  # cache of the compiled ruleset
+# No rule in yara_rules.yar can match fewer bytes than this
+MIN_PAYLOAD_LEN = 4
+
 
 class HybridThreatAnalyzer:
     def __init__(self):
@@ -23,8 +28,12 @@ class HybridThreatAnalyzer:
         if not self.vt_api_key:
             logger.warning("⚠️ VT_API_KEY not set. VirusTotal integration disabled.")
 
+        # Keep-alive session: repeat uploads reuse the TCP/TLS connection
+        self._session = requests.Session()
+        self._session.headers.update(self._vt_headers())
+
         try:
-            self.rules = yara.compile("yara_rules.yar")
+            self.rules = self._load_rules()
             logger.info("✅ YARA rules loaded successfully")
         except Exception as e:
             logger.error(f"❌ YARA load failed: {e}")
@@ -32,12 +41,30 @@ class HybridThreatAnalyzer:
 
     # ---------- YARA (local) ----------
 
-    def yara_scan(self, text_payload: str):
+    def _load_rules(self):
+        """Load the compiled ruleset if it is current, else compile and cache it."""
+        if (
+            os.path.exists(YARA_COMPILED)
+            and os.path.getmtime(YARA_COMPILED) >= os.path.getmtime(YARA_SOURCE)
+        ):
+            try:
+                return yara.load(YARA_COMPILED)
+            except yara.Error as e:  # e.g. saved by another libyara version
+                logger.warning(f"⚠️ Compiled YARA cache unusable, recompiling: {e}")
+
+        rules = yara.compile(YARA_SOURCE)
+        try:
+            rules.save(YARA_COMPILED)
+        except yara.Error as e:
+            logger.warning(f"⚠️ Could not cache compiled YARA rules: {e}")
+        return rules
+
+    def yara_scan(self, payload_bytes: bytes):
         try:
             if not self.rules:
                 return {"detected": False, "error": "YARA not loaded", "risk_score": 0}
 
-            matches = self.rules.match(data=text_payload.encode("utf-8"))
+            matches = self.rules.match(data=payload_bytes)
             detections = []
             score = 0
 
@@ -70,15 +97,12 @@ class HybridThreatAnalyzer:
             "User-Agent": "stegothreat-demo",
         }
 
-    def _payload_to_bytes(self, text_payload: str) -> bytes:
-        return text_payload.encode("utf-8")
-
     def _sha256(self, data: bytes) -> str:
-        h = hashlib.sha256()
-        h.update(data)
-        return h.hexdigest()
+        # One-shot call into OpenSSL (SHA-NI where the CPU has it); the hash
+        # only identifies the payload on VT, so it is not security-relevant
+        return hashlib.sha256(data, usedforsecurity=False).hexdigest()
 
-    def virustotal_v3(self, text_payload: str):
+    def virustotal_v3(self, payload_bytes: bytes):
         """
         Upload payload bytes to VT v3 and return only status + sha256.
         No polling, no engine stats; UI will show link using sha256.
@@ -86,14 +110,13 @@ class HybridThreatAnalyzer:
         if not self.vt_api_key:
             return {"error": "No VT API key", "status": "error", "sha256": None}
 
-        payload_bytes = self._payload_to_bytes(text_payload)
         sha256_hash = self._sha256(payload_bytes)
 
         files = {"file": ("payload.txt", payload_bytes)}
         url = f"{self.vt_base}/files"
 
         try:
-            r = requests.post(url, headers=self._vt_headers(), files=files, timeout=20)
+            r = self._session.post(url, files=files, timeout=20)
             logger.info(f"VT v3 /files status={r.status_code}")
 
             if r.status_code != 200:
@@ -119,8 +142,22 @@ class HybridThreatAnalyzer:
     def analyze(self, text_payload: str):
         logger.info(f"Analyzing payload ({len(text_payload)} chars)")
 
-        yara_result = self.yara_scan(text_payload)
-        vt_result = self.virustotal_v3(text_payload) if self.vt_api_key else None
+        # Nothing extracted (no stego marker) or too short for any signature:
+        # skip the YARA scan and the VT upload round-trip
+        if len(text_payload) < MIN_PAYLOAD_LEN:
+            return {
+                "detected": False,
+                "risk_score": 0,
+                "yara": {"detected": False, "threats": [], "risk_score": 0, "engines": "0 YARA rules"},
+                "virustotal": None,
+                "status": "✅ Clean",
+                "payload_length": len(text_payload),
+            }
+
+        # Encode once; YARA, the hash and the VT upload share the buffer
+        payload_bytes = text_payload.encode("utf-8")
+        yara_result = self.yara_scan(payload_bytes)
+        vt_result = self.virustotal_v3(payload_bytes) if self.vt_api_key else None
 
         # Overall risk is driven by YARA only (VT is external confirmation)
         final_risk = yara_result["risk_score"]
@@ -1,49 +1,46 @@
 import numpy as np
 from PIL import Image
 
+try:
+    from lsb_stego_numba import embed_bytes as _embed_bytes_jit
+    from lsb_stego_numba import extract_bytes as _extract_bytes_jit
+except ImportError:  # numba is optional
+    _embed_bytes_jit = _extract_bytes_jit = None
+
+# Below this many payload bits the NumPy path wins (JIT dispatch overhead)
+NUMBA_MIN_BITS = 1 << 20
+
 def lsb_embed_text(cover_np, text_payload):
     """Embed TEXT payload using LSB - FIXED for uint8"""
-    payload_bytes = text_payload.encode('utf-8')
-    payload_bits = ''.join(format(b, '08b') for b in payload_bytes)
-    payload_bits += '1111111111111111'  # End marker
-    
-    # ✅ CRITICAL FIX: Work with int32 to avoid overflow
-    stego_flat = cover_np.flatten().astype(np.int32)  # Use int32 temporarily
-    bit_idx = 0
+    payload_bytes = text_payload.encode('utf-8') + b'\xff\xff'  # 16-bit end marker
     
-    for i in range(len(stego_flat)):
-        if bit_idx < len(payload_bits):
-            # Clear LSB and set new bit
-            stego_flat[i] = (stego_flat[i] & ~1) | int(payload_bits[bit_idx])
-            bit_idx += 1
-        else:
-            break
+    # Stays uint8: (x & 0xFE) | bit never leaves 0-255, so no int32 detour
+    stego_flat = cover_np.flatten()  # copy; the cover is left untouched
+    if _embed_bytes_jit is not None and len(payload_bytes) * 8 >= NUMBA_MIN_BITS:
+        _embed_bytes_jit(stego_flat, np.frombuffer(payload_bytes, dtype=np.uint8))
+    else:
+        payload_bits = np.unpackbits(np.frombuffer(payload_bytes, dtype=np.uint8))
+        n = min(payload_bits.size, stego_flat.size)
+        stego_flat[:n] &= np.uint8(0xFE)
+        stego_flat[:n] |= payload_bits[:n]
     
-    # ✅ Convert back to uint8 (clamps 0-255)
-    return stego_flat.clip(0, 255).astype(np.uint8).reshape(cover_np.shape)
+    return stego_flat.reshape(cover_np.shape)
 
 def lsb_extract_text(stego_np, max_chars=2000):
     """Extract TEXT payload until end marker"""
-    stego_flat = stego_np.flatten()
-    bits = ''
-    
-    for pixel in stego_flat:
-        bits += str(pixel & 1)
-        if len(bits) >= max_chars * 8 + 16:
-            break
-    
-    end_marker = '1111111111111111'
-    end_idx = bits.find(end_marker)
-    if end_idx != -1:
-        bits = bits[:end_idx]
-    
-    text = ''
-    for i in range(0, len(bits), 8):
-        byte_bits = bits[i:i+8]
-        if len(byte_bits) == 8:
-            try:
-                text += chr(int(byte_bits, 2))
-            except:
-                break
+    # LSBs of the first max_chars bytes + marker, packed MSB-first like the embed.
+    # The marker follows whole payload bytes, and 0xFF never occurs in UTF-8.
+    nbits = min(max_chars * 8 + 16, stego_np.size)
+    if _extract_bytes_jit is not None and nbits >= NUMBA_MIN_BITS:
+        out = np.empty(nbits // 8, dtype=np.uint8)
+        buf = out[:_extract_bytes_jit(np.ascontiguousarray(stego_np).reshape(-1), out)].tobytes()
+    else:
+        lsbs = stego_np.reshape(-1)[:nbits] & 1
+        buf = np.packbits(lsbs).tobytes()
+        end_idx = buf.find(b'\xff\xff')
+        if end_idx != -1:
+            buf = buf[:end_idx]
+        elif nbits % 8:
+            buf = buf[:-1]  # drop the zero-padded partial byte
     
-    return text.strip()
+    return buf.decode('utf-8', errors='ignore').strip()
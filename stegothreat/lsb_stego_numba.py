@@ -0,0 +1,49 @@
+# lsb_stego_numba.py
+import numpy as np
+from numba import njit, prange
+
+
+# SWAR spread (inverse of a multiply-gather): payload byte p -> one 0/1 byte
+# per bit, MSB first in memory order, as a little-endian uint64.
+_BYTE_ONES = np.uint64(0x0101010101010101)
+_MSB_FIRST = np.uint64(0x0102040810204080)  # byte k keeps bit 7-k of p
+_TO_BIT7 = np.uint64(0x7F7F7F7F7F7F7F7F)    # any nonzero byte -> bit 7 set
+_CLEAR_LSB = np.uint64(0xFEFEFEFEFEFEFEFE)
+
+
+@njit(parallel=True, cache=True)
+def _embed_words(words, payload):
+    for j in prange(words.size):
+        spread = (np.uint64(payload[j]) * _BYTE_ONES) & _MSB_FIRST
+        bits = ((spread + _TO_BIT7) >> np.uint64(7)) & _BYTE_ONES
+        words[j] = (words[j] & _CLEAR_LSB) | bits
+
+
+@njit(cache=True)
+def embed_bytes(flat, payload):
+    """
+    Bits of payload (uint8, MSB first) -> LSBs of flat, in place (1-D uint8).
+    Bits past the end of flat are dropped. Eight cover bytes are rewritten
+    per uint64 op, with no unpacked-bits temporary.
+    """
+    nb = min(payload.size, flat.size // 8)
+    _embed_words(flat[:nb * 8].view(np.uint64), payload)
+    # trailing partial word when the cover runs out mid-byte
+    for i in range(nb * 8, min(payload.size * 8, flat.size)):
+        flat[i] = (flat[i] & 0xFE) | ((payload[i >> 3] >> (7 - (i & 7))) & 1)
+
+
+@njit(cache=True)
+def extract_bytes(flat, out):
+    """
+    LSBs of flat (1-D uint8) packed MSB first into out, stopping at the
+    0xFFFF end marker. Returns the payload length (out.size if no marker).
+    """
+    for i in range(out.size):
+        b = 0
+        for k in range(8):
+            b = (b << 1) | (flat[8 * i + k] & 1)
+        out[i] = b
+        if b == 0xFF and i > 0 and out[i - 1] == 0xFF:
+            return i - 1
+    return out.size